@@ -0,0 +1,86 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+"""
+Cooperative FizzBuzz generation for asyncio applications.
+
+Rendering a chunk is not interrupted, but control is handed back to the event
+loop between chunks, so large ranges do not block other tasks.
+"""
+from asyncio import StreamWriter, sleep
+from itertools import islice
+from typing import AsyncIterator
+from .fizzbuzz import CHUNK_LINES, Program, render
+
+
+async def batches(program: Program, numbers: range,
+                  lines: int = CHUNK_LINES) -> AsyncIterator[list[str]]:
+    """
+    Applies a program to a range of integers in batches, yielding control to
+    the event loop after each batch.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param lines: Number of results per batch.
+    :return: Asynchronous iterator over lists of results.
+    """
+    results = program.evaluate(numbers)
+    while batch := list(islice(results, lines)):
+        yield batch
+        await sleep(0)
+
+
+async def chunks(program: Program, numbers: range,
+                 lines: int = CHUNK_LINES) -> AsyncIterator[bytes]:
+    """
+    Renders the output of a program like `render`, yielding control to the
+    event loop after each chunk.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param lines: Approximate number of lines per chunk.
+    :return: Asynchronous iterator over the chunks in the order of the range.
+    """
+    for chunk in render(program, numbers, lines):
+        yield chunk
+        await sleep(0)
+
+
+async def write_range(program: Program, numbers: range, writer: StreamWriter,
+                      lines: int = CHUNK_LINES) -> int:
+    """
+    Writes the output of a program for a range of integers to a stream.  The
+    stream is drained after each chunk, so a slow reader applies backpressure
+    instead of the output piling up in memory.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param writer: Stream to write to, it is not closed.
+    :param lines: Approximate number of lines per chunk.
+    :return: Total number of bytes written.
+    """
+    total = 0
+    async for chunk in chunks(program, numbers, lines):
+        writer.write(chunk)
+        await writer.drain()
+        total += len(chunk)
+    return total
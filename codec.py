@@ -0,0 +1,164 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+"""
+Compact binary encoding of FizzBuzz output.
+
+Instead of text, the encoding stores which rules apply to each integer.  The
+distinct masks of matching rules are stored once in a table, and each line is
+stored as an index into that table, using as few bytes per line as the table
+size permits.  Numbers are not stored at all since they follow from the
+position of the line in the range.
+
+Layout, all integers little-endian:
+- header: magic, version, bytes per code, number of rules, number of masks,
+  start, stop and step of the range
+- rules: number and UTF-8 encoded length of the value, followed by the value
+- masks: one 64 bit mask per table entry, bit `k` set if rule `k` applies
+- codes: one table index per line
+"""
+from array import array
+from struct import Struct, error as StructError
+from typing import Iterator, Literal, NamedTuple
+import sys
+from .fizzbuzz import Program, Rule, _concat
+
+
+MAGIC = b'FZBC'
+VERSION = 1
+
+# Magic, version, bytes per code, rules, masks, start, stop and step
+HEADER = Struct('<4sBBHIqqq')
+RULE = Struct('<qI')
+
+# Array type codes by the number of bytes per code
+TYPECODES: dict[int, Literal['B', 'H', 'I', 'Q']] = \
+    {1: 'B', 2: 'H', 4: 'I', 8: 'Q'}
+
+
+class Encoded(NamedTuple):
+    """
+    Decoded view of encoded output.
+
+    Attributes:
+    `rules`    Ordered rules the output was produced with
+    `numbers`  Range of integers the output covers
+    `masks`    Table of distinct masks of matching rules
+    `codes`    Index into the table of masks for each line; this is a flat
+               buffer of unsigned integers which can be handed to NumPy
+    """
+    rules: tuple[Rule, ...]
+    numbers: range
+    masks: tuple[int, ...]
+    codes: memoryview
+
+    def lines(self) -> Iterator[str]:
+        """The output for each integer of the range, in order."""
+        texts = [_concat(self.rules, mask) for mask in self.masks]
+        return (texts[code] or str(i)
+                for code, i in zip(self.codes, self.numbers))
+
+
+def encode(program: Program, numbers: range) -> bytes:
+    """
+    Encodes the output of a program for a range of integers.  The range and
+    the rule numbers have to fit into signed 64 bit integers and there can be
+    at most 64 rules.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :return: The encoded output.
+    :raises ValueError: If the range or a rule number does not fit into
+                        signed 64 bit integers, or if there are more than 64
+                        rules.
+    """
+    rules = program.rules
+    bounds = range(-1 << 63, 1 << 63)
+    if not all(i in bounds for i in (numbers.start, numbers.stop,
+                                     numbers.step)):
+        raise ValueError('The range has to fit into signed 64 bit integers')
+    if not all(rule.number in bounds for rule in rules):
+        raise ValueError('Rule numbers have to fit into signed 64 bit '
+                         'integers')
+    masks = program.mask_range(numbers)
+    table: dict[int, int] = {}
+    indices = [table.setdefault(mask, len(table)) for mask in masks]
+    size = next(size for size in TYPECODES if len(table) <= 1 << 8 * size)
+    codes = array(TYPECODES[size], indices)
+    header = HEADER.pack(MAGIC, VERSION, size, len(rules), len(table),
+                         numbers.start, numbers.stop, numbers.step)
+    parts = [header]
+    for rule in rules:
+        value = rule.value.encode()
+        parts += [RULE.pack(rule.number, len(value)), value]
+    table_array = array('Q', table)
+    if sys.byteorder == 'big':
+        table_array.byteswap()
+        codes.byteswap()
+    parts += [table_array.tobytes(), codes.tobytes()]
+    return b''.join(parts)
+
+
+def decode(data: bytes) -> Encoded:
+    """
+    Decodes output encoded by `encode`.  The codes are not copied.
+
+    :param data: The encoded output.
+    :return: The rules, range, table of masks and codes.
+    :raises ValueError: If the data is not encoded FizzBuzz output.
+    """
+    view = memoryview(data)
+    try:
+        (magic, version, size, rule_count, mask_count, start, stop,
+         step) = HEADER.unpack_from(view)
+    except StructError:
+        raise ValueError('Not encoded FizzBuzz output')
+    if magic != MAGIC or version != VERSION or size not in TYPECODES:
+        raise ValueError('Not encoded FizzBuzz output')
+    offset = HEADER.size
+    rules = []
+    for _ in range(rule_count):
+        try:
+            number, length = RULE.unpack_from(view, offset)
+        except StructError:
+            raise ValueError('Truncated FizzBuzz output')
+        offset += RULE.size
+        rules.append(Rule(number, str(view[offset:offset + length], 'utf-8')))
+        offset += length
+    numbers = range(start, stop, step)
+    end = offset + 8 * mask_count + size * len(numbers)
+    if len(view) != end:
+        raise ValueError(f'Expected {end} bytes of FizzBuzz output, '
+                         f'got {len(view)}')
+    masks = array('Q')
+    masks.frombytes(view[offset:offset + 8 * mask_count])
+    offset += 8 * mask_count
+    codes = view[offset:end]
+    if sys.byteorder == 'big':
+        masks.byteswap()
+        swapped = array(TYPECODES[size])
+        swapped.frombytes(codes)
+        swapped.byteswap()
+        codes = memoryview(swapped)
+    return Encoded(tuple(rules), numbers, tuple(masks),
+                   codes.cast(TYPECODES[size]))
+
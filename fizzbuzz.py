@@ -20,9 +20,42 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 # For more information, please refer to <https://unlicense.org/>
-from typing import Callable, Iterable, NamedTuple
-from functools import partial
-from itertools import islice, count
+from typing import (TYPE_CHECKING, BinaryIO, Callable, Container, Iterable,
+                    Iterator, Literal, NamedTuple, Sequence, overload)
+from array import array
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import lru_cache, partial
+from heapq import heapify, heapreplace, merge
+from importlib.util import find_spec
+from itertools import count, cycle, islice
+from math import gcd, isqrt, lcm
+import io
+import os
+import sys
+
+if TYPE_CHECKING:
+    import numpy as np
+    from _typeshed import WriteableBuffer
+
+
+TABLE_LIMIT = 1 << 14
+"""Largest period for which a lookup table will be precomputed by default."""
+
+TREE_LIMIT = 6
+"""Largest number of rules for which generated code branches on every rule."""
+
+LATTICE_CACHE = 1 << 12
+"""Largest number of distinct outputs a lattice-compiled function remembers."""
+
+FACTOR_LIMIT = 1 << 20
+"""Default largest integer which is factorized with a sieve."""
+
+INTERN_LIMIT = 12
+"""Largest number of rules whose combinations of values are all interned."""
+
+CHUNK_LINES = 1 << 14
+"""Approximate number of lines rendered into one chunk of bytes."""
 
 
 class Rule(NamedTuple):
@@ -45,31 +78,1357 @@ class Rule(NamedTuple):
         return i % self.number == 0
 
 
-def compile_rules(rules: Iterable[Rule]) -> Callable[[int], str]:
+class Stats(NamedTuple):
     """
-    Compiles a rule set into an executable FizzBuzzing function.
+    Statistics of the output of a program over a range of integers.
 
-    :param rules: Ordered sequence of FizzBuzz rules.
-    :return: Function which applied to an integer returns the FizzBuzz result
+    Attributes:
+    `matches`  Number of integers each rule applies to, in order of the rules
+    `numeric`  Number of integers which are output as is
+    `outputs`  Number of occurrences of each distinct non-numeric output
     """
-    rules = list(rules)
+    matches: tuple[int, ...]
+    numeric: int
+    outputs: dict[str, int]
 
-    def closure(i: int) -> str:
-        # Use a map to apply each rule in succession to the number, filter out
-        # indivisible ones.  If the result is empty return the number,
-        # otherwise join all the strings.
-        s = ''.join(map(str, filter(partial(Rule.test, i=i), rules)))
+
+class Simplified(NamedTuple):
+    """
+    Result of simplifying a rule set.
+
+    Attributes:
+    `rules`    The simplified rules
+    `removed`  Rules which were dropped because they never contribute
+    `merged`   Groups of adjacent rules which were merged into a single rule
+    """
+    rules: tuple[Rule, ...]
+    removed: tuple[Rule, ...]
+    merged: tuple[tuple[Rule, ...], ...]
+
+
+@dataclass(frozen=True)
+class Program:
+    """
+    A compiled FizzBuzz rule set which can be applied to integers.
+
+    The output for an integer `i` only depends on `i` modulo the least common
+    multiple of all rule numbers, so the output pattern repeats with that
+    period.  If the period is small enough the pattern can be precomputed
+    once, turning each call into a single modulo and a lookup.
+
+    Attributes:
+    `rules`   Ordered sequence of FizzBuzz rules
+    `period`  Least common multiple of all rule numbers
+    `table`   Concatenated values for each remainder modulo `period`, or
+              `None` if the rules are applied one by one
+    `masks`   Bit masks of the matching rules for each remainder modulo
+              `period`, or `None` if the rules are applied one by one
+    `texts`   Interned concatenated values for every mask, or `None` if they
+              are concatenated on demand
+    """
+    rules: tuple[Rule, ...]
+    period: int
+    table: tuple[str, ...] | None
+    masks: tuple[int, ...] | None = None
+    texts: tuple[str, ...] | None = None
+
+    def __call__(self, i: int) -> str:
+        """Apply the program to the integer `i`."""
+        if self.table is None and self.texts is not None:
+            s = self.texts[_mask(self.rules, i)]
+        elif self.table is None:
+            # Use a map to apply each rule in succession to the number, filter
+            # out indivisible ones.
+            s = ''.join(map(str, filter(partial(Rule.test, i=i), self.rules)))
+        else:
+            s = self.table[i % self.period]
+        # If the result is empty return the number, otherwise the joined
+        # strings.
         match s:
             case '':
                 return str(i)
             case _:
                 return s
 
+    def at(self, i: int) -> str:
+        """
+        Look up the result for the integer `i` in the table.  This takes a
+        single modulo and a lookup no matter the magnitude of `i`, the rules
+        themselves are never applied.  Negative integers and zero are looked
+        up like any other integer; zero is divisible by every rule number.
+
+        :param i: The integer to look up.
+        :return: The same result as applying the program to `i`.
+        :raises ValueError: If the program is not tabulated.
+        """
+        if self.table is None:
+            raise ValueError('Program has no table, use compile_table')
+        return self.table[i % self.period] or str(i)
+
+    def evaluate(self, numbers: range) -> Iterator[str]:
+        """
+        Apply the program to a whole range of integers in one call.
+
+        For a tabulated program the table entries for the given stride repeat
+        after at most one period, so they are gathered once and then cycled
+        alongside the numbers; only numbers which no rule applies to need to be
+        converted to strings.
+
+        :param numbers: Range of integers to apply the program to.
+        :return: Iterator over the results in the order of the range.
+        """
+        if self.table is None:
+            return map(self, numbers)
+        table, period = self.table, self.period
+        length = min(period // gcd(numbers.step, period), _length(numbers))
+        pattern = [table[i % period] for i in numbers[:length]]
+        return (s or str(i) for s, i in zip(cycle(pattern), numbers))
+
+    def mask(self, i: int) -> int:
+        """
+        Compute which rules apply to the integer `i`, without concatenating
+        their values.
+
+        :param i: The integer to test.
+        :return: Bit mask with bit `k` set if the `k`-th rule applies.
+        """
+        if self.masks is None:
+            return _mask(self.rules, i)
+        return self.masks[i % self.period]
+
+    def mask_range(self, numbers: range) -> array:
+        """
+        Compute the masks of `mask` for a whole range of integers.  The array
+        uses the smallest unsigned type which fits a bit for every rule, so
+        the masks of up to 16 rules are stored in an `array('H')`; it can be
+        wrapped by NumPy without copying using `numpy.frombuffer`.
+
+        :param numbers: Range of integers to test.
+        :return: Array of masks in the order of the range.
+        :raises ValueError: If there are more than 64 rules.
+        """
+        typecode = _typecode(self.rules)
+        if self.masks is None:
+            return array(typecode, (_mask(self.rules, i) for i in numbers))
+        masks, period = self.masks, self.period
+        length = min(period // gcd(numbers.step, period), _length(numbers))
+        pattern = array(typecode, (masks[i % period]
+                                   for i in numbers[:length]))
+        if not pattern:
+            return pattern
+        repeats, rest = divmod(_length(numbers), length)
+        return pattern * repeats + pattern[:rest]
+
+    def format(self, mask: int, i: int) -> str:
+        """
+        Turn a mask computed by `mask` back into the result for the integer
+        `i`.  Interned programs look the text up, all others concatenate the
+        values of the rules in the mask.
+
+        :param mask: Bit mask of the rules which apply to `i`.
+        :param i: The integer the mask was computed for.
+        :return: The same result as applying the program to `i`.
+        """
+        if self.texts is not None:
+            return self.texts[mask] or str(i)
+        return _concat(self.rules, mask) or str(i)
+
+    def count(self, text: str | None, numbers: range) -> int:
+        """
+        Count the integers in a range for which the program outputs `text`.
+        The counts are derived from the number of multiples of the rule
+        numbers in the range, so the time taken does not depend on the length
+        of the range.
+
+        :param text: Expected output, or `None` to count numeric outputs.
+        :param numbers: Range of integers to search.
+        :return: Number of integers in the range with the given output.
+        """
+        counts = _exact_counts(self.rules, numbers)
+        return (sum(counts[mask] for mask in self._masks(text, counts))
+                + len(self._numerals(text, numbers)))
+
+    def find(self, text: str | None, numbers: range) -> Iterator[int]:
+        """
+        Find the integers in a range for which the program outputs `text`.
+        Only multiples of the rule numbers which can produce the text are
+        visited.
+
+        :param text: Expected output, or `None` to find numeric outputs.
+        :param numbers: Range of integers to search.
+        :return: Iterator over matching integers in the order of the range.
+        """
+        candidates: list[Iterable[int]] = [self._numerals(text, numbers)]
+        for mask in self._masks(text, _exact_counts(self.rules, numbers)):
+            candidates.append(_exact_multiples(self.rules, mask, numbers))
+        return merge(*candidates,
+                     key=lambda i: (i - numbers.start) // numbers.step)
+
+    def stats(self, numbers: range) -> Stats:
+        """
+        Compute statistics of the output over a range of integers.  Like
+        `count` this uses inclusion–exclusion over the rule numbers instead of
+        evaluating the range.
+
+        :param numbers: Range of integers to compute the statistics of.
+        :return: Statistics of the output.
+        """
+        matches = tuple(_length(_multiples(numbers, rule.number))
+                        for rule in self.rules)
+        numeric = 0
+        outputs: dict[str, int] = {}
+        for mask, n in _exact_counts(self.rules, numbers).items():
+            if not n:
+                continue
+            if text := _concat(self.rules, mask):
+                outputs[text] = outputs.get(text, 0) + n
+            else:
+                numeric += n
+        return Stats(matches, numeric, outputs)
+
+    def size(self, numbers: range) -> int:
+        """
+        Compute the number of bytes of the rendered output of a range, that is
+        the UTF-8 encoded results, each followed by a newline, as written by
+        `write_range`.  The lines are counted separately for each number of
+        decimal digits of the numerals, so nothing is rendered.
+
+        :param numbers: Range of integers whose output to measure.
+        :return: Size of the output in bytes.
+        """
+        return sum(_prefix_size(_size_terms(self.rules, part, width),
+                                _length(part))
+                   for _, part, width in _pieces(numbers))
+
+    def offset(self, numbers: range, line: int) -> int:
+        """
+        Compute the byte offset of a line in the rendered output of a range.
+
+        :param numbers: Range of integers whose output to measure.
+        :param line: Index of the line, i.e. of its integer in the range.
+        :return: Offset of the first byte of the line.
+        """
+        return self.size(numbers[:line])
+
+    def line(self, numbers: range, offset: int) -> int:
+        """
+        Find the line which contains a byte of the rendered output of a range.
+        The parts of the range with the same width of numerals are skipped
+        whole, within the part containing the byte the line offsets are
+        bisected.  The terms of the part are computed once, so each step of
+        the bisection is plain arithmetic.
+
+        :param numbers: Range of integers whose output to search.
+        :param offset: Offset of the byte.
+        :return: Index of the line, or the length of the range if the offset
+                 lies past the end of the output.
+        """
+        for first, part, width in _pieces(numbers):
+            terms = _size_terms(self.rules, part, width)
+            lower, upper = 0, _length(part)
+            size = _prefix_size(terms, upper)
+            if offset >= size:
+                offset -= size
+                continue
+            while lower < upper:
+                middle = (lower + upper + 1) // 2
+                if _prefix_size(terms, middle) <= offset:
+                    lower = middle
+                else:
+                    upper = middle - 1
+            return first + lower
+        return _length(numbers)
+
+    def _masks(self, text: str | None, counts: dict[int, int]) -> list[int]:
+        """Masks of rules whose values concatenate to a non-numeric text."""
+        if text == '':
+            return []
+        return [mask for mask in counts
+                if _concat(self.rules, mask) == (text or '')]
+
+    def _numerals(self, text: str | None, numbers: range) -> list[int]:
+        """The integer in the range which is output as the numeral `text`."""
+        i = None if text is None else _numeral(text)
+        if i is None or i not in numbers \
+                or _concat(self.rules, _mask(self.rules, i)):
+            return []
+        return [i]
+
+
+def _length(numbers: range) -> int:
+    """The length of a range, which unlike `len` may exceed `sys.maxsize`."""
+    return max(0, -((numbers.start - numbers.stop) // numbers.step))
+
+
+def _mask(rules: Sequence[Rule], i: int) -> int:
+    """Bit mask of the rules which apply to the integer `i`."""
+    return sum(1 << k for k, rule in enumerate(rules) if rule.test(i))
+
+
+def _typecode(rules: Sequence[Rule]) -> str:
+    """Smallest unsigned array type code which fits a mask of the rules."""
+    for typecode in 'BHIQ':
+        if len(rules) <= 8 * array(typecode).itemsize:
+            return typecode
+    raise ValueError('At most 64 rules fit into a mask')
+
+
+def _concat(rules: Sequence[Rule], mask: int) -> str:
+    """Ordered concatenation of the values of the rules in the mask."""
+    return ''.join(rule.value for k, rule in enumerate(rules) if mask >> k & 1)
+
+
+def _numeral(text: str) -> int | None:
+    """The integer `text` is the canonical representation of, if any."""
+    try:
+        i = int(text)
+    except ValueError:
+        return None
+    return i if str(i) == text else None
+
+
+def _multiples(numbers: range, d: int) -> range:
+    """The multiples of `d` in a range, which are themselves a range."""
+    match _progression(numbers.start, numbers.step, d):
+        case None:
+            return numbers[:0]
+        case k, m:
+            return numbers[k::m]
+
+
+def _progression(a: int, s: int, d: int) -> tuple[int, int] | None:
+    """
+    The first index `k` for which `a + k * s` is a multiple of `d` and the
+    distance `m` to the next one, if any: if `a + k * s` is divisible by `d`
+    then so is `a + (k + m) * s` for `m = d / gcd(s, d)`.
+    """
+    d = abs(d)
+    g = gcd(s, d)
+    if a % g:
+        return None
+    m = d // g
+    return -a // g * pow(s // g, -1, m) % m, m
+
+
+def _widths(numbers: range) -> Iterator[tuple[range, int]]:
+    """
+    Split a range into parts whose integers have the same number of
+    characters in decimal notation, including the sign.  The order of the
+    integers within the parts may be reversed.
+    """
+    if numbers.step < 0:
+        numbers = numbers[::-1]
+    if not numbers:
+        return
+    first, last = numbers[0], numbers[-1]
+    if last >= 0:
+        for width in range(len(str(max(first, 0))), len(str(last)) + 1):
+            lower = 10 ** (width - 1) if width > 1 else 0
+            yield _within(numbers, lower, 10 ** width), width
+    if first < 0:
+        for width in range(len(str(min(last, -1))), len(str(first)) + 1):
+            yield _within(numbers, 1 - 10 ** (width - 1),
+                          1 - 10 ** (width - 2) if width > 2 else 0), width
+
+
+def _pieces(numbers: range) -> list[tuple[int, range, int]]:
+    """
+    The parts of `_widths` in the order of the range, each along with the
+    index of its first integer in the range.
+    """
+    pieces = []
+    for part, width in _widths(numbers):
+        if part:
+            a, b = ((i - numbers.start) // numbers.step
+                    for i in (part[0], part[-1]))
+            first = min(a, b)
+            pieces.append((first, numbers[first:max(a, b) + 1], width))
+    return sorted(pieces)
+
+
+def _size_terms(rules: Sequence[Rule], numbers: range,
+                width: int) -> list[tuple[int, int, int]]:
+    """
+    Terms from which the size of the rendered output of any prefix of a range
+    follows, given the width of all numerals in the range.  There is a term
+    for each mask of rules whose numbers have common multiples in the range:
+    the index of the first multiple, the distance between multiples and the
+    weight of the mask.  The weights are the line sizes of the masks with the
+    sizes of all their subsets subtracted by inclusion–exclusion, so summing
+    the weights over the multiples of each mask yields the size of the lines.
+    """
+    multiples: dict[int, range] = {}
+
+    def visit(start: int, mask: int, common: range) -> None:
+        multiples[mask] = common
+        for k in range(start, len(rules)):
+            if submultiples := _multiples(common, rules[k].number):
+                visit(k + 1, mask | 1 << k, submultiples)
+
+    visit(0, 0, numbers)
+    weights = {mask: (len(_concat(rules, mask).encode()) or width) + 1
+               for mask in multiples}
+    for k in range(len(rules)):
+        bit = 1 << k
+        for mask in weights:
+            if mask & bit:
+                weights[mask] -= weights[mask ^ bit]
+    return [((r.start - numbers.start) // numbers.step,
+             r.step // numbers.step, weights[mask])
+            for mask, r in multiples.items() if weights[mask]]
+
+
+def _prefix_size(terms: list[tuple[int, int, int]], lines: int) -> int:
+    """The size of the first lines of a range given its `_size_terms`."""
+    return sum(weight * max(0, -((first - lines) // distance))
+               for first, distance, weight in terms)
+
+
+def _within(numbers: range, lower: int, upper: int) -> range:
+    """The integers of an ascending range which lie in `[lower, upper)`."""
+    def index(bound: int) -> int:
+        k = -((numbers.start - bound) // numbers.step)
+        return min(max(k, 0), _length(numbers))
+    return numbers[index(lower):index(upper)]
+
+
+def _exact_multiples(rules: Sequence[Rule], mask: int,
+                     numbers: range) -> Iterator[int]:
+    """The integers in a range to which exactly the rules in a mask apply."""
+    multiples = numbers
+    for k, rule in enumerate(rules):
+        if mask >> k & 1:
+            multiples = _multiples(multiples, rule.number)
+    return (i for i in multiples if _mask(rules, i) == mask)
+
+
+def _exact_counts(rules: Sequence[Rule], numbers: range) -> dict[int, int]:
+    """
+    For each mask of rules, the number of integers in the range to which
+    exactly the rules in the mask apply.  Masks which apply to no integer may
+    be missing.
+
+    First the integers which at least the rules in a mask apply to are
+    counted, which only needs the multiples of the rule numbers.  Masks with
+    no multiples are pruned, along with all their supersets.  Then
+    inclusion–exclusion over supersets turns these into exact counts.
+    """
+    counts: dict[int, int] = {}
+
+    def visit(start: int, mask: int, multiples: range) -> None:
+        counts[mask] = _length(multiples)
+        for k in range(start, len(rules)):
+            if submultiples := _multiples(multiples, rules[k].number):
+                visit(k + 1, mask | 1 << k, submultiples)
+
+    visit(0, 0, numbers)
+    for k in range(len(rules)):
+        bit = 1 << k
+        for mask in counts:
+            if not mask & bit and mask | bit in counts:
+                counts[mask] -= counts[mask | bit]
+    return counts
+
+
+def simplify(rules: Iterable[Rule]) -> Simplified:
+    """
+    Simplifies a rule set without changing its output for any integer.  Rule
+    numbers are made positive, rules with an empty value are removed and runs
+    of adjacent rules with the same number are merged into one rule with the
+    concatenated values.  Rules are never reordered, since the order of the
+    values in the output depends on it.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :return: The simplified rules and what was removed and merged.
+    """
+    removed: list[Rule] = []
+    groups: list[list[Rule]] = []
+    for rule in rules:
+        if not rule.value:
+            removed.append(rule)
+        elif groups and abs(groups[-1][0].number) == abs(rule.number):
+            groups[-1].append(rule)
+        else:
+            groups.append([rule])
+    return Simplified(
+        tuple(Rule(abs(group[0].number), ''.join(map(str, group)))
+              for group in groups),
+        tuple(removed),
+        tuple(tuple(group) for group in groups if len(group) > 1))
+
+
+def compile_rules(rules: Iterable[Rule]) -> Program:
+    """
+    Compiles a rule set into an executable FizzBuzzing function.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    rules = tuple(rules)
+    return Program(rules, lcm(*(rule.number for rule in rules)), None)
+
+
+def compile_table(rules: Iterable[Rule], limit: int = TABLE_LIMIT) -> Program:
+    """
+    Compiles a rule set into a program which looks up its results in a
+    precomputed table covering one full period of the output pattern.  If the
+    period exceeds the limit the rules are applied one by one instead, just
+    like with `compile_rules`.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param limit: Largest period which will be tabulated.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    program = compile_rules(rules)
+    if not 0 < program.period <= limit:
+        return program
+    # Stride through the table once per rule instead of testing every rule
+    # against every remainder, then concatenate the values of each distinct
+    # mask only once.
+    masks = [0] * program.period
+    for j, rule in enumerate(program.rules):
+        for k in range(0, program.period, abs(rule.number)):
+            masks[k] |= 1 << j
+    texts = {mask: _concat(program.rules, mask) for mask in set(masks)}
+    return replace(program, table=tuple(texts[mask] for mask in masks),
+                   masks=tuple(masks))
+
+
+def compile_interned(rules: Iterable[Rule],
+                     limit: int = INTERN_LIMIT) -> Program:
+    """
+    Compiles a rule set like `compile_table`, but also precomputes the
+    concatenated values of every combination of rules and interns them.  All
+    non-numeric results are then shared string objects, both within the
+    program and across programs, so producing them allocates nothing.  If
+    there are more rules than the limit, the program is left as it is.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param limit: Largest number of rules whose combinations are interned.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    program = compile_table(rules)
+    if len(program.rules) > limit:
+        return program
+    texts = tuple(sys.intern(_concat(program.rules, mask))
+                  for mask in range(1 << len(program.rules)))
+    table = None if program.masks is None else \
+        tuple(texts[mask] for mask in program.masks)
+    return replace(program, table=table, texts=texts)
+
+
+def compile_source(rules: Iterable[Rule]) -> Callable[[int], str]:
+    """
+    Compiles a rule set into a plain function by generating specialized Python
+    source code with the rule numbers and values as constants.  Up to
+    `TREE_LIMIT` rules the code is a tree of conditionals with one branch per
+    rule and the precomputed concatenation in each leaf, so no string is built
+    unless the number itself is returned.  Larger rule sets are compiled to a
+    chain of conditionals which append to the result.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    rules = tuple(rules)
+    if len(rules) <= TREE_LIMIT:
+        body = _source_tree(rules, '', 1)
+    else:
+        body = ["    s = ''"]
+        for rule in rules:
+            body.append(f'    if not i % {rule.number!r}:')
+            body.append(f'        s += {rule.value!r}')
+        body.append('    return s or str(i)')
+    source = '\n'.join(['def fizzbuzz(i: int) -> str:', *body, ''])
+    namespace: dict[str, Callable[[int], str]] = {}
+    exec(compile(source, '<fizzbuzz>', 'exec'), namespace)
+    return namespace['fizzbuzz']
+
+
+def _source_tree(rules: tuple[Rule, ...], text: str, depth: int) -> list[str]:
+    """Lines of a tree of conditionals on the rules, `text` matched so far."""
+    indent = '    ' * depth
+    if not rules:
+        return [f'{indent}return {text!r} or str(i)']
+    rule, rest = rules[0], rules[1:]
+    return [f'{indent}if i % {rule.number!r}:',
+            *_source_tree(rest, text, depth + 1),
+            *_source_tree(rest, text + rule.value, depth)]
+
+
+def compile_lattice(rules: Iterable[Rule]) -> Callable[[int], str]:
+    """
+    Compiles a rule set into a function which tests each distinct rule number
+    at most once, pruning by divisibility: the numbers form a forest in which
+    the parent of each number is its largest divisor among the other numbers.
+    If an integer is not divisible by a number it is not divisible by any of
+    its descendants either, so they are skipped.  Rule sets with many shared
+    or nested numbers, like powers of two, need far fewer tests than rules.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    rules = tuple(rules)
+    numbers = sorted({abs(rule.number) for rule in rules})
+    positions: dict[int, list[int]] = {d: [] for d in numbers}
+    for j, rule in enumerate(rules):
+        positions[abs(rule.number)].append(j)
+    roots, children = _lattice(numbers)
+
+    # The tree is always traversed in the same order, so equal sets of
+    # matching numbers are always found in the same order as well and can be
+    # used as keys of the concatenated values.
+    texts: dict[tuple[int, ...], str] = {}
+
+    def closure(i: int) -> str:
+        matched = []
+        pending = roots[:]
+        while pending:
+            d = pending.pop()
+            if not i % d:
+                matched.append(d)
+                pending += children[d]
+        if not matched:
+            return str(i)
+        key = tuple(matched)
+        if (text := texts.get(key)) is None:
+            matches = sorted(j for d in matched for j in positions[d])
+            text = ''.join(rules[j].value for j in matches)
+            if len(texts) < LATTICE_CACHE:
+                texts[key] = text
+        return text or str(i)
+
+    return closure
+
+
+def _lattice(numbers: list[int]) -> tuple[list[int], dict[int, list[int]]]:
+    """Roots and children of the divisibility forest of sorted numbers."""
+    roots: list[int] = []
+    children: dict[int, list[int]] = {d: [] for d in numbers}
+    for k, d in enumerate(numbers):
+        parent = _parent(d, numbers, k, children)
+        (roots if parent is None else children[parent]).append(d)
+    return roots, children
+
+
+def _parent(d: int, numbers: list[int], k: int,
+            present: Container[int]) -> int | None:
+    """
+    The largest divisor of `d` among the first `k` of the sorted numbers.
+    Either the divisors of `d` are enumerated by trial division up to its
+    square root, or the smaller numbers are scanned, whichever takes fewer
+    steps.
+    """
+    if not d:
+        return None
+    root = isqrt(d)
+    if root >= k:
+        return next((e for e in reversed(numbers[:k]) if e and not d % e),
+                    None)
+    # The cofactors of the divisors up to the square root descend and are at
+    # least as large as any of these divisors
+    small = None
+    for q in range(1, root + 1):
+        if not d % q:
+            if d // q != d and d // q in present:
+                return d // q
+            if q != d and q in present:
+                small = q
+    return small
+
+
+def compile_factored(rules: Iterable[Rule],
+                     limit: int = FACTOR_LIMIT) -> Callable[[int], str]:
+    """
+    Compiles a rule set into a function which factorizes its argument using a
+    sieve of smallest prime factors up to `limit`.  The divisors of the
+    argument are then looked up among the rule numbers, so the cost depends on
+    the number of divisors rather than the number of rules, which pays off for
+    rule sets of thousands of rules.  Integers beyond the limit are tested
+    against each rule like with `compile_rules`.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param limit: Largest absolute value to factorize.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    program = compile_rules(rules)
+    rules = program.rules
+    positions: dict[int, list[int]] = {}
+    for j, rule in enumerate(rules):
+        positions.setdefault(abs(rule.number), []).append(j)
+    if 0 in positions:
+        return program
+    largest = max(positions, default=1)
+    everything = ''.join(map(str, rules))
+    factors = _smallest_factors(limit)
+
+    def closure(i: int) -> str:
+        n = abs(i)
+        if n > limit:
+            return program(i)
+        if n == 0:
+            return everything or '0'
+        divisors = [1]
+        while n > 1:
+            p = factors[n]
+            power, powers = 1, []
+            while not n % p:
+                n //= p
+                power *= p
+                powers.append(power)
+            divisors += [d * q for d in divisors for q in powers
+                         if d * q <= largest]
+        matches = sorted(j for d in divisors if d in positions
+                         for j in positions[d])
+        return ''.join(rules[j].value for j in matches) or str(i)
+
     return closure
 
 
+@lru_cache(maxsize=4)
+def _smallest_factors(limit: int) -> array:
+    """
+    Sieve of the smallest prime factor of each integer up to `limit`.  The
+    primes up to the square root are struck out in descending order, so the
+    smallest one is the last to be written to each of its multiples.  The
+    sieve is shared by all programs with the same limit and never modified.
+    """
+    root = isqrt(limit)
+    composite = bytearray(root + 1)
+    primes = []
+    for p in range(2, root + 1):
+        if not composite[p]:
+            primes.append(p)
+            composite[p * p::p] = b'\1' * len(range(p * p, root + 1, p))
+    factors = array('I' if limit < 1 << 32 else 'Q', range(limit + 1))
+    for p in reversed(primes):
+        factors[p * p::p] = array(factors.typecode, [p]) \
+            * len(range(p * p, limit + 1, p))
+    return factors
+
+
+def stream(rules: Iterable[Rule], start: int = 1,
+           step: int = 1) -> Iterator[str]:
+    """
+    Applies a rule set to the unbounded sequence `start`, `start + step`, ...
+    without computing any modulo per number.  Instead the position of the
+    next multiple of each rule number is kept in a heap, so a number which no
+    rule applies to costs a single comparison, no matter how many rules there
+    are or how large their least common multiple is.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param start: First integer of the sequence.
+    :param step: Difference between consecutive integers.
+    :return: Infinite iterator over the results.
+    """
+    rules = tuple(rules)
+    # Index of the next multiple, position of the rule, distance of multiples
+    upcoming = []
+    for j, rule in enumerate(rules):
+        if (progression := _progression(start, step, rule.number)) is not None:
+            k, m = progression
+            upcoming.append((k, j, m))
+    heapify(upcoming)
+    for k, i in enumerate(count(start, step)):
+        if not upcoming or upcoming[0][0] != k:
+            yield str(i)
+            continue
+        matches = []
+        while upcoming and upcoming[0][0] == k:
+            _, j, m = upcoming[0]
+            matches.append(j)
+            heapreplace(upcoming, (k + m, j, m))
+        matches.sort()
+        yield ''.join(rules[j].value for j in matches) or str(i)
+
+
+def sieve(rules: Iterable[Rule], numbers: range,
+          block: int = CHUNK_LINES) -> Iterator[str]:
+    """
+    Applies a rule set to a range block by block, like a segmented sieve: the
+    values of each rule are appended to the results of its multiples in the
+    block by striding over them, so a block of `K` integers costs
+    `K * sum(1 / rule.number)` steps to mark instead of `K * len(rules)`
+    modulos.  No table is needed, so the least common multiple of the rule
+    numbers may be arbitrarily large.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param numbers: Range of integers to apply the rules to.
+    :param block: Number of integers per block.
+    :return: Iterator over the results in the order of the range.
+    """
+    rules = tuple(rules)
+    for offset in range(0, _length(numbers), block):
+        part = numbers[offset:offset + block]
+        texts = [''] * len(part)
+        for rule in rules:
+            match _progression(part.start, part.step, rule.number):
+                case k, m:
+                    for j in range(k, len(part), m):
+                        texts[j] += rule.value
+        yield from (text or str(i) for text, i in zip(texts, part))
+
+
+@lru_cache(maxsize=256)
+def compile_cached(rules: tuple[Rule, ...]) -> Program:
+    """
+    Compiles a rule set like `compile_table`, but keeps the most recently used
+    programs around.  The rules have to be passed as a tuple because they are
+    the key of the cache.  Use `compile_cached.cache_info()` for hit and miss
+    statistics and `compile_cached.cache_clear()` to empty the cache.
+
+    :param rules: Ordered tuple of FizzBuzz rules.
+    :return: Function which applied to an integer returns the FizzBuzz result
+    """
+    return compile_table(rules)
+
+
+def render(program: Program, numbers: range,
+           lines: int = CHUNK_LINES) -> Iterator[bytes]:
+    """
+    Renders the output of a program for a range of integers as chunks of
+    UTF-8 encoded, newline-terminated lines.
+
+    For a tabulated program the encoded lines of one stride cycle are repeated
+    into a block of roughly `lines` lines once; afterwards only the numeric
+    lines of the block are patched for each chunk.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param lines: Approximate number of lines per chunk.
+    :return: Iterator over the chunks in the order of the range.
+    """
+    if program.table is None:
+        yield from _encode(program.evaluate(numbers), lines)
+        return
+    table, period = program.table, program.period
+    length = min(period // gcd(numbers.step, period), _length(numbers))
+    texts = [table[i % period] for i in numbers[:length]]
+    repeat = max(1, lines // length) if length else 0
+    span = length * repeat
+    block = [f'{text}\n'.encode() for text in texts] * repeat
+    holes = [k for k, text in enumerate(texts * repeat) if not text]
+    for offset in range(0, _length(numbers), span or 1):
+        part = numbers[offset:offset + span]
+        if len(part) < span:
+            del block[len(part):]
+            holes = [k for k in holes if k < len(part)]
+        for k in holes:
+            block[k] = b'%d\n' % part[k]
+        yield b''.join(block)
+
+
+def _encode(results: Iterator[str], lines: int) -> Iterator[bytes]:
+    """Encode results into chunks of `lines` newline-terminated lines."""
+    while chunk := list(islice(results, lines)):
+        chunk.append('')
+        yield '\n'.join(chunk).encode()
+
+
+def write_range(program: Program, numbers: range, fp: BinaryIO,
+                lines: int = CHUNK_LINES) -> int:
+    """
+    Writes the output of a program for a range of integers to a binary file
+    in large chunks.  Sockets are written to using their `sendall` method.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param fp: Buffered binary file object or socket.
+    :param lines: Approximate number of lines per chunk.
+    :return: Total number of bytes written.
+    """
+    return _write_chunks(render(program, numbers, lines), fp)
+
+
+class OutputFile(io.RawIOBase):
+    """
+    Read-only binary file of the rendered output of a program, as written by
+    `write_range`, which is rendered on demand.  Seeking uses the line offset
+    index of the program, so arbitrary positions can be read without rendering
+    the output in front of them.  Sequential reads continue rendering where
+    the previous read stopped.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to, or the first
+                    integer of an unbounded range with step one.
+    """
+    def __init__(self, program: Program, numbers: range | int):
+        super().__init__()
+        self.program = program
+        self.bounded = isinstance(numbers, range)
+        if isinstance(numbers, range):
+            self.numbers = numbers
+        else:
+            # Large enough that nobody can ever read up to its end
+            self.numbers = range(numbers, numbers + (1 << 128))
+        self._position = 0
+        self._chunks: Iterator[bytes] | None = None
+        self._chunk = b''
+        self._chunk_offset = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._check_open()
+        match whence:
+            case io.SEEK_SET:
+                position = offset
+            case io.SEEK_CUR:
+                position = self._position + offset
+            case io.SEEK_END if self.bounded:
+                position = self.program.size(self.numbers) + offset
+            case io.SEEK_END:
+                raise io.UnsupportedOperation('unbounded output has no end')
+            case _:
+                raise ValueError(f'invalid whence ({whence})')
+        if position < 0:
+            raise ValueError(f'negative seek position {position}')
+        self._position = position
+        return position
+
+    def readinto(self, buffer: 'WriteableBuffer') -> int:
+        self._check_open()
+        view = memoryview(buffer).cast('B')
+        filled = 0
+        while filled < len(view):
+            start = self._position - self._chunk_offset
+            if not 0 <= start < len(self._chunk):
+                if self._chunks is None or start != len(self._chunk):
+                    self._restart()
+                else:
+                    self._chunk_offset += len(self._chunk)
+                    self._chunk = next(self._chunks, b'')
+                if not self._chunk:
+                    break
+                continue
+            n = min(len(view) - filled, len(self._chunk) - start)
+            view[filled:filled + n] = memoryview(self._chunk)[start:start + n]
+            filled += n
+            self._position += n
+        return filled
+
+    def close(self) -> None:
+        self._chunks = None
+        self._chunk = b''
+        super().close()
+
+    def _check_open(self) -> None:
+        if self.closed:
+            raise ValueError('I/O operation on closed file')
+
+    def _restart(self) -> None:
+        """Start rendering at the line which contains the current position."""
+        line = self.program.line(self.numbers, self._position)
+        self._chunks = render(self.program, self.numbers[line:])
+        self._chunk = next(self._chunks, b'')
+        self._chunk_offset = self.program.offset(self.numbers, line)
+
+
+def render_parallel(program: Program, numbers: range,
+                    workers: int | None = None,
+                    lines: int = CHUNK_LINES << 3) -> Iterator[bytes]:
+    """
+    Renders the output of a program like `render`, but shards the range into
+    parts of `lines` lines which are rendered by a pool of worker processes.
+    The program is sent to each worker once, only the ranges are sent per
+    part.  The parts are yielded in order, at most two parts per worker are in
+    flight at any time.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param lines: Number of lines per part.
+    :return: Iterator over the rendered parts in the order of the range.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    workers = workers or os.cpu_count() or 1
+    parts = (numbers[k:k + lines] for k in range(0, _length(numbers), lines))
+    with ProcessPoolExecutor(workers, initializer=_adopt_program,
+                             initargs=(program,)) as executor:
+        pending = deque(executor.submit(_render_part, part)
+                        for part in islice(parts, 2 * workers))
+        while pending:
+            chunk = pending.popleft().result()
+            pending.extend(executor.submit(_render_part, part)
+                           for part in islice(parts, 1))
+            yield chunk
+
+
+def write_parallel(program: Program, numbers: range, fp: BinaryIO,
+                   workers: int | None = None,
+                   lines: int = CHUNK_LINES << 3) -> int:
+    """
+    Writes the output of a program for a range of integers to a binary file
+    or socket like `write_range`, rendering it in worker processes.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param fp: Buffered binary file object or socket.
+    :param workers: Number of worker processes, defaults to the CPU count.
+    :param lines: Number of lines rendered by a worker at a time.
+    :return: Total number of bytes written.
+    """
+    return _write_chunks(render_parallel(program, numbers, workers, lines), fp)
+
+
+def _write_chunks(chunks: Iterable[bytes], fp: BinaryIO) -> int:
+    """Write chunks to a file or socket, returns the number of bytes."""
+    write = getattr(fp, 'sendall', None) or fp.write
+    total = 0
+    for chunk in chunks:
+        write(chunk)
+        total += len(chunk)
+    return total
+
+
+# The program a worker process of `render_parallel` renders with
+_worker_program: Program | None = None
+
+
+def _adopt_program(program: Program) -> None:
+    """Initialize a worker process with the program it renders with."""
+    global _worker_program
+    _worker_program = program
+
+
+def _render_part(numbers: range) -> bytes:
+    """Render one part of the range in a worker process."""
+    assert _worker_program is not None
+    return b''.join(render(_worker_program, numbers))
+
+
+def match_masks(rules: Sequence[Rule], values: 'np.ndarray') -> 'np.ndarray':
+    """
+    Tests a rule set against a whole array of integers at once.  Bit `k` of
+    each resulting mask is set if the `k`-th rule applies to the corresponding
+    integer.  Requires NumPy, which is only imported on demand.
+
+    :param rules: Ordered sequence of at most 64 FizzBuzz rules.
+    :param values: One-dimensional array of integers.
+    :return: Array of `uint64` masks of the same shape as `values`.
+    """
+    import numpy as np
+
+    if len(rules) > 64:
+        raise ValueError('At most 64 rules fit into a mask')
+    values = np.asarray(values)
+    info = np.iinfo(values.dtype)
+    masks = np.zeros(values.shape, dtype=np.uint64)
+    for k, rule in enumerate(rules):
+        number = abs(rule.number)
+        if number == 0:
+            raise ZeroDivisionError('integer modulo by zero')
+        if number > info.max:
+            # The number does not fit the array type, only zero and possibly
+            # the most negative value can be multiples of it
+            hits = values == 0
+            if -number == info.min:
+                hits |= values == info.min
+        else:
+            hits = values % number == 0
+        masks |= hits.astype(np.uint64) << np.uint64(k)
+    return masks
+
+
+def materialize(rules: Sequence[Rule], values: 'np.ndarray',
+                masks: 'np.ndarray') -> list[str]:
+    """
+    Turns the masks computed by `match_masks` into the FizzBuzz output.  Each
+    distinct mask is only joined into a string once.
+
+    :param rules: The rules which were used to compute the masks.
+    :param values: One-dimensional array of integers.
+    :param masks: Masks of matching rules for each integer.
+    :return: List of results in the order of the `values`.
+    """
+    import numpy as np
+
+    unique, inverse = np.unique(masks, return_inverse=True)
+    texts = [_concat(rules, mask) for mask in unique.tolist()]
+    return [texts[j] or str(i)
+            for j, i in zip(inverse.tolist(), np.asarray(values).tolist())]
+
+
+def render_vectorized(program: Program, numbers: range,
+                      lines: int = CHUNK_LINES) -> Iterator[bytes]:
+    """
+    Renders the output of a program like `render`, but evaluates each chunk
+    with `match_masks` and `materialize`.  Requires NumPy and a range which
+    fits into 64 bit integers.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param lines: Number of lines per chunk.
+    :return: Iterator over the chunks in the order of the range.
+    """
+    return _encode(_vectorized_range(program.rules, numbers), lines)
+
+
+Pattern = Literal['random', 'sequential', 'batch']
+"""How a program is applied: to unrelated integers, or to a range of them."""
+
+
+class Plan(NamedTuple):
+    """
+    The evaluation strategy chosen for a rule set.
+
+    Attributes:
+    `engine`     Name of the chosen engine
+    `cost`       Estimated cost per integer of the chosen engine
+    `estimates`  Estimated cost per integer of every applicable engine
+    `rules`      Ordered sequence of FizzBuzz rules
+    `pattern`    How the program will be applied
+    """
+    engine: str
+    cost: float
+    estimates: dict[str, float]
+    rules: tuple[Rule, ...]
+    pattern: Pattern
+
+    def build(self) -> Callable[[int], str] | Callable[[range], Iterator[str]]:
+        """
+        Build the executable of the plan.  For the `random` pattern it takes
+        an integer and returns its result, otherwise it takes a range of
+        integers and returns an iterator over their results.
+        """
+        rules = self.rules
+        match self.pattern, self.engine:
+            case 'random', 'table':
+                return compile_table(rules)
+            case 'random', 'source':
+                return compile_source(rules)
+            case 'random', 'lattice':
+                return compile_lattice(rules)
+            case 'random', 'factored':
+                return compile_factored(rules)
+            case 'random', _:
+                return compile_rules(rules)
+            case _, 'table':
+                return compile_table(rules).evaluate
+            case _, 'source':
+                return partial(map, compile_source(rules))
+            case _, 'lattice':
+                return partial(map, compile_lattice(rules))
+            case _, 'factored':
+                return partial(map, compile_factored(rules))
+            case _, 'sieve':
+                return partial(sieve, rules)
+            case _, 'stream':
+                return partial(_stream_range, rules)
+            case _, 'vectorized':
+                return partial(_vectorized_range, rules)
+            case _:
+                return compile_rules(rules).evaluate
+
+
+def plan(rules: Iterable[Rule], pattern: Pattern = 'random') -> Plan:
+    """
+    Chooses the fastest evaluation strategy for a rule set.  The estimates are
+    a rough model of each engine, fitted to CPython and given in nanoseconds
+    per integer on a typical machine.  They take into account the number of
+    rules, whether their least common multiple can be tabulated, how densely
+    the rules match and how long their values are.  The `batch` pattern
+    assumes ranges within 64 bit integers, which makes NumPy applicable.  The
+    factorizing engine is estimated for integers up to `FACTOR_LIMIT`.  The
+    rules are simplified first, the plan uses the simplified rules.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param pattern: Whether integers arrive at random, as one long sequence
+                    or as ranges.
+    :return: The plan with the lowest estimated cost.
+    """
+    rules = simplify(rules).rules
+    k = len(rules)
+    period = lcm(*(rule.number for rule in rules))
+    # Expected number of matching rules and joined characters per integer
+    density = sum(1 / abs(rule.number) for rule in rules if rule.number)
+    chars = sum(len(rule.value) / abs(rule.number)
+                for rule in rules if rule.number)
+    # Expected number of divisibility tests of the lattice
+    roots, children = _lattice(sorted({abs(rule.number) for rule in rules}))
+    tests = len(roots) + sum(len(c) / d for d, c in children.items() if d)
+    estimates: dict[str, float] = {
+        'rules': 450 * k + 100 + chars,
+        'source': (150 + 25 * k if k <= TREE_LIMIT else 100 + 35 * k + chars),
+        'lattice': 600 + 130 * tests + chars,
+        'factored': 3400 + 110 * k.bit_length() + chars,
+    }
+    tabulated = 0 < period <= TABLE_LIMIT
+    if pattern == 'random':
+        if tabulated:
+            estimates['table'] = 250
+    else:
+        if tabulated:
+            estimates['table'] = 135
+        estimates['sieve'] = 180 + 80 * density + chars
+        estimates['stream'] = 170 + 600 * density + chars
+        if pattern == 'batch' and k <= 64 and find_spec('numpy') is not None:
+            estimates['vectorized'] = 170 + 12 * k + chars
+    engine = min(estimates, key=estimates.__getitem__)
+    return Plan(engine, estimates[engine], estimates, rules, pattern)
+
+
+@overload
+def compile_best(rules: Iterable[Rule],
+                 pattern: Literal['random'] = ...) -> Callable[[int], str]:
+    ...
+
+
+@overload
+def compile_best(rules: Iterable[Rule], pattern: Literal['sequential', 'batch']
+                 ) -> Callable[[range], Iterator[str]]:
+    ...
+
+
+def compile_best(rules: Iterable[Rule], pattern: Pattern = 'random'
+                 ) -> Callable[[int], str] | Callable[[range], Iterator[str]]:
+    """
+    Compiles a rule set with the strategy chosen by `plan`.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param pattern: Whether integers arrive at random, as one long sequence
+                    or as ranges.
+    :return: Function of an integer for the `random` pattern, otherwise
+             function of a range of integers returning their results.
+    """
+    return plan(rules, pattern).build()
+
+
+def _stream_range(rules: tuple[Rule, ...], numbers: range) -> Iterator[str]:
+    """The results of `stream` for a range of integers."""
+    # Unlike islice, zip is not limited to sys.maxsize items
+    return (s for s, _ in zip(stream(rules, numbers.start, numbers.step),
+                              numbers))
+
+
+def _vectorized_range(rules: tuple[Rule, ...],
+                      numbers: range) -> Iterator[str]:
+    """The results of `match_masks` and `materialize` for a range."""
+    import numpy as np
+
+    for k in range(0, _length(numbers), CHUNK_LINES):
+        part = numbers[k:k + CHUNK_LINES]
+        values = np.arange(part.start, part.stop, part.step, dtype=np.int64)
+        yield from materialize(rules, values, match_masks(rules, values))
+
+
+ENGINES = ('rules', 'table', 'source', 'lattice', 'factored', 'vectorized',
+           'parallel', 'stream', 'sieve')
+"""Names of the evaluation engines the command-line interface can use."""
+
+
+def parse_rule(text: str) -> Rule:
+    """
+    Parses a rule from its command-line representation `NUMBER:VALUE`.
+
+    :param text: The number and value of the rule, separated by a colon.
+    :return: The parsed rule.
+    """
+    from argparse import ArgumentTypeError
+
+    number, sep, value = text.partition(':')
+    try:
+        if not sep:
+            raise ValueError(text)
+        return Rule(int(number), value)
+    except ValueError:
+        raise ArgumentTypeError(f'expected NUMBER:VALUE, got {text!r}')
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    """
+    Command-line entry point, writes the output for a range of integers.
+
+    :param argv: Command-line arguments, defaults to those of the process.
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(
+        prog='fizzbuzz', description='Play FizzBuzz over a range of numbers.')
+    parser.add_argument('--start', type=int, default=1,
+                        help='first number (default: %(default)s)')
+    parser.add_argument('--stop', type=int, default=101,
+                        help='end of the range (default: %(default)s)')
+    parser.add_argument('--step', type=int, default=1,
+                        help='increment (default: %(default)s)')
+    parser.add_argument('--rule', dest='rules', action='append',
+                        type=parse_rule, metavar='NUMBER:VALUE',
+                        help='add a rule (default: 3:Fizz 5:Buzz)')
+    parser.add_argument('--output', '-o', default='-',
+                        help='file to write to (default: standard output)')
+    parser.add_argument('--engine', choices=ENGINES,
+                        help='evaluation engine (default: fastest)')
+    parser.add_argument('--workers', type=int,
+                        help='worker processes of the parallel engine')
+    args = parser.parse_args(argv)
+    if args.step == 0:
+        parser.error('the step must not be zero')
+    if args.workers is not None and args.workers < 1:
+        parser.error('the number of workers must be positive')
+    if args.engine == 'vectorized' and find_spec('numpy') is None:
+        parser.error('the vectorized engine requires NumPy')
+    rules = args.rules or [Rule(3, 'Fizz'), Rule(5, 'Buzz')]
+    numbers = range(args.start, args.stop, args.step)
+
+    program = compile_rules(rules)
+    if args.engine != 'rules':
+        program = compile_table(program.rules)
+    match args.engine or _default_engine(program, numbers):
+        case 'rules' | 'table':
+            chunks = render(program, numbers)
+        case 'vectorized':
+            chunks = render_vectorized(program, numbers)
+        case 'source':
+            chunks = _encode(map(compile_source(program.rules), numbers),
+                             CHUNK_LINES)
+        case 'parallel':
+            chunks = render_parallel(program, numbers, args.workers)
+        case 'stream':
+            chunks = _encode(_stream_range(program.rules, numbers),
+                             CHUNK_LINES)
+        case 'sieve':
+            chunks = _encode(sieve(program.rules, numbers), CHUNK_LINES)
+        case 'lattice':
+            chunks = _encode(map(compile_lattice(program.rules), numbers),
+                             CHUNK_LINES)
+        case 'factored':
+            chunks = _encode(map(compile_factored(program.rules), numbers),
+                             CHUNK_LINES)
+        case engine:
+            parser.error(f'unknown engine {engine!r}')
+    # The output is only opened, and thereby truncated, once the arguments
+    # turned out to be valid
+    if args.output == '-':
+        output = sys.stdout.buffer
+    else:
+        try:
+            output = open(args.output, 'wb')
+        except OSError as e:
+            parser.error(f"can't open '{args.output}': {e}")
+    try:
+        _write_chunks(chunks, output)
+        output.flush()
+    except BrokenPipeError:
+        # The reader went away, keep the interpreter from complaining about
+        # the unflushed standard output on exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout.buffer:
+            output.close()
+
+
+def _default_engine(program: Program, numbers: range) -> str:
+    """The engine planned for a range, batched if NumPy can hold it."""
+    bounds = range(-1 << 63, 1 << 63)
+    if all(i in bounds for i in (*numbers[:1], *numbers[-1:])):
+        return plan(program.rules, 'batch').engine
+    return plan(program.rules, 'sequential').engine
+
+
 if __name__ == '__main__':
-    rules = [Rule(3, 'Fizz'), Rule(5, 'Buzz')]
-    fizzbuzz = compile_rules(rules)
-    for line in islice(map(fizzbuzz, count(1)), 100):
-        print(line)
+    main()
@@ -0,0 +1,222 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+"""
+Precomputed FizzBuzz output in memory-mapped files.
+
+A cache file consists of a fixed-size header, the byte offset of every line
+and finally the rendered output itself.  The header identifies the rule set
+by a fingerprint and records the range of integers, so a stale file can be
+detected and rebuilt.  All integers are stored little-endian.
+"""
+from array import array
+from hashlib import sha256
+from itertools import accumulate, islice
+from mmap import ACCESS_READ, mmap
+from os import PathLike
+from struct import Struct, error as StructError
+from tempfile import mkstemp
+from typing import Iterable, Sequence
+import os
+import sys
+from .fizzbuzz import CHUNK_LINES, Program, Rule
+
+
+MAGIC = b'FZBZ'
+VERSION = 1
+
+# Magic, version, rule fingerprint, start, stop, step and number of lines
+HEADER = Struct('<4sH2x32sqqqQ')
+OFFSET = Struct('<Q')
+
+
+def fingerprint(rules: Iterable[Rule]) -> bytes:
+    """
+    Computes a digest which identifies an ordered rule set.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :return: SHA-256 digest of the rules.
+    """
+    return sha256(repr(tuple(map(tuple, rules))).encode()).digest()
+
+
+def save(program: Program, numbers: range, path: str | PathLike) -> None:
+    """
+    Renders the output of a program for a range of integers into a cache
+    file.  The file is written next to its destination and then moved into
+    place, so readers which still map a previous version of the file keep
+    working and an incomplete file is never mistaken for a cache file.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param path: Path of the file to write, it will be replaced.
+    :raises ValueError: If the range does not fit into signed 64 bit integers.
+    """
+    bounds = range(-1 << 63, 1 << 63)
+    if not all(i in bounds for i in (numbers.start, numbers.stop,
+                                     numbers.step)):
+        raise ValueError('The range has to fit into signed 64 bit integers')
+    lines = len(numbers)
+    header = HEADER.pack(MAGIC, VERSION, fingerprint(program.rules),
+                         numbers.start, numbers.stop, numbers.step, lines)
+    results = program.evaluate(numbers)
+    fd, temporary = mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                            prefix='.', suffix='.tmp')
+    try:
+        with open(fd, 'wb') as fp:
+            fp.seek(len(header))
+            fp.write(OFFSET.pack(0))
+            table = fp.tell()
+            fp.seek(table + OFFSET.size * lines)
+            offset = 0
+            # The offsets follow from the encoded results rather than from
+            # the newlines in the output, since rule values may contain
+            # newlines.  They are written chunk by chunk, so they never pile
+            # up in memory.
+            while chunk := [s.encode() for s in islice(results, CHUNK_LINES)]:
+                lengths = (len(line) + 1 for line in chunk)
+                offsets = array('Q', accumulate(lengths, initial=offset))
+                del offsets[0]
+                offset = offsets[-1]
+                chunk.append(b'')
+                fp.write(b'\n'.join(chunk))
+                if sys.byteorder == 'big':
+                    offsets.byteswap()
+                position = fp.tell()
+                fp.seek(table)
+                fp.write(offsets.tobytes())
+                table = fp.tell()
+                fp.seek(position)
+            fp.seek(0)
+            fp.write(header)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class MappedOutput:
+    """
+    Read-only view of a cache file written by `save`.  The file is mapped into
+    memory, looking up a line takes two offsets and a slice of the mapping.
+
+    :param path: Path of the cache file.
+    :raises ValueError: If the file is not a cache file.
+    """
+    def __init__(self, path: str | PathLike):
+        with open(path, 'rb') as fp:
+            self._mmap = mmap(fp.fileno(), 0, access=ACCESS_READ)
+        try:
+            (magic, version, self.fingerprint, start, stop, step,
+             lines) = HEADER.unpack_from(self._mmap)
+            end = HEADER.size + OFFSET.size * (lines + 1)
+            # The last offset is the size of the output, which has to end
+            # with the file
+            valid = (magic == MAGIC and version == VERSION
+                     and len(self._mmap) >= end
+                     and len(self._mmap) == end + OFFSET.unpack_from(
+                         self._mmap, end - OFFSET.size)[0])
+        except StructError:
+            valid = False
+        if not valid:
+            self._mmap.close()
+            raise ValueError(f'Not a FizzBuzz cache file: {path}')
+        self.numbers = range(start, stop, step)
+        self._offsets: Sequence[int] = \
+            memoryview(self._mmap)[HEADER.size:end].cast('Q')
+        if sys.byteorder == 'big':
+            self._offsets = array('Q', self._offsets)
+            self._offsets.byteswap()
+        self._data = memoryview(self._mmap)[end:]
+
+    def __enter__(self) -> 'MappedOutput':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def close(self) -> None:
+        """
+        Release the memory mapping.  All views returned by `line` have to be
+        released before, otherwise a `BufferError` is raised.
+        """
+        if isinstance(self._offsets, memoryview):
+            self._offsets.release()
+        self._data.release()
+        self._mmap.close()
+
+    def matches(self, program: Program, numbers: range) -> bool:
+        """Whether the file holds the output of a program for a range."""
+        return (self.fingerprint == fingerprint(program.rules)
+                and self.numbers == numbers)
+
+    def line(self, k: int) -> memoryview:
+        """
+        The `k`-th line of the output, without its newline.  The view has to
+        be released, or go out of scope, before the file is closed; copy it
+        with `bytes` to keep the line around.
+
+        :param k: Index of the line, i.e. of its integer in the range.
+        :return: View into the mapped file.
+        """
+        start, stop = self._offset(k), self._offset(k + 1) - 1
+        return self._data[start:stop]
+
+    def at(self, i: int) -> str:
+        """
+        The output for the integer `i`, which has to be part of the range.
+
+        :param i: Integer from the range of the file.
+        :return: The decoded line of the integer.
+        """
+        return str(self.line(self.numbers.index(i)), 'utf-8')
+
+    def _offset(self, k: int) -> int:
+        if not 0 <= k <= len(self.numbers):
+            raise IndexError('line index out of range')
+        return self._offsets[k]
+
+
+def open_cached(program: Program, numbers: range,
+                path: str | PathLike) -> MappedOutput:
+    """
+    Opens the cache file of a program for a range of integers, (re-)building
+    it first if it is missing or holds a different rule set or range.
+
+    :param program: Compiled FizzBuzz program.
+    :param numbers: Range of integers to apply the program to.
+    :param path: Path of the cache file.
+    :return: Memory-mapped view of the output.
+    """
+    try:
+        output = MappedOutput(path)
+    except (OSError, ValueError):
+        pass
+    else:
+        if output.matches(program, numbers):
+            return output
+        output.close()
+    save(program, numbers, path)
+    return MappedOutput(path)
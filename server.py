@@ -0,0 +1,170 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+"""
+Minimal HTTP/1.1 service for a FizzBuzz rule set.
+
+Endpoints:
+`/at/{i}`                         Result for the integer `i`
+`/range?start=&stop=[&step=]`     Results for a range, streamed in chunks
+`/stats?start=&stop=[&step=]`     Statistics of a range as JSON
+
+Each connection serves a single GET request.  This is meant for local
+services behind a proper front end, not for exposure to the internet.
+"""
+from asyncio import Server, StreamReader, StreamWriter, run, start_server
+from functools import partial
+from http import HTTPStatus
+from json import dumps
+from typing import Iterable
+from urllib.parse import parse_qs, urlsplit
+from .aio import chunks
+from .fizzbuzz import Program, Rule, compile_cached
+
+
+async def start(rules: Iterable[Rule], host: str = '127.0.0.1',
+                port: int = 8000) -> Server:
+    """
+    Starts serving a rule set.  The program is taken from the cache of
+    compiled programs.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param host: Address to listen on.
+    :param port: Port to listen on, zero picks a free one.
+    :return: The running server.
+    """
+    program = compile_cached(tuple(rules))
+    return await start_server(partial(_handle, program), host, port)
+
+
+def serve(rules: Iterable[Rule], host: str = '127.0.0.1',
+          port: int = 8000) -> None:
+    """
+    Serves a rule set until interrupted.
+
+    :param rules: Ordered sequence of FizzBuzz rules.
+    :param host: Address to listen on.
+    :param port: Port to listen on.
+    """
+    async def forever() -> None:
+        async with await start(rules, host, port) as server:
+            await server.serve_forever()
+
+    run(forever())
+
+
+class _BadRequest(Exception):
+    """The request cannot be answered, carries the status and its reason."""
+    def __init__(self, status: HTTPStatus, reason: str = ''):
+        super().__init__(reason or status.phrase)
+        self.status = status
+
+
+async def _handle(program: Program, reader: StreamReader,
+                  writer: StreamWriter) -> None:
+    """Answer one connection, turning bad requests into error responses."""
+    try:
+        try:
+            await _dispatch(program, reader, writer)
+        except _BadRequest as e:
+            _head(writer, e.status, 'text/plain; charset=utf-8')
+            writer.write(f'{e}\n'.encode())
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def _dispatch(program: Program, reader: StreamReader,
+                    writer: StreamWriter) -> None:
+    """Parse the request line and route it to its endpoint."""
+    try:
+        method, target, _ = (await reader.readline()).decode().split(' ', 2)
+    except (UnicodeDecodeError, ValueError):
+        raise _BadRequest(HTTPStatus.BAD_REQUEST)
+    while (await reader.readline()).strip():
+        pass  # The headers do not matter
+    if method != 'GET':
+        raise _BadRequest(HTTPStatus.METHOD_NOT_ALLOWED)
+    url = urlsplit(target)
+    match url.path.split('/'):
+        case ['', 'at', number]:
+            i = _integer(number, 'i')
+            text = program(i) if program.table is None else program.at(i)
+            _head(writer, HTTPStatus.OK, 'text/plain; charset=utf-8')
+            writer.write(f'{text}\n'.encode())
+        case ['', 'range']:
+            numbers = _range(url.query)
+            _head(writer, HTTPStatus.OK, 'text/plain; charset=utf-8',
+                  chunked=True)
+            async for chunk in chunks(program, numbers):
+                writer.write(b'%x\r\n%b\r\n' % (len(chunk), chunk))
+                await writer.drain()
+            writer.write(b'0\r\n\r\n')
+        case ['', 'stats']:
+            stats = program.stats(_range(url.query))
+            body = {
+                'rules': [{'number': rule.number, 'value': rule.value,
+                           'matches': matches}
+                          for rule, matches in zip(program.rules,
+                                                   stats.matches)],
+                'numeric': stats.numeric,
+                'outputs': stats.outputs,
+            }
+            _head(writer, HTTPStatus.OK, 'application/json')
+            writer.write(dumps(body).encode())
+        case _:
+            raise _BadRequest(HTTPStatus.NOT_FOUND)
+
+
+def _head(writer: StreamWriter, status: HTTPStatus, content_type: str,
+          chunked: bool = False) -> None:
+    """Write the status line and headers of a response."""
+    lines = [f'HTTP/1.1 {status.value} {status.phrase}',
+             f'Content-Type: {content_type}',
+             'Connection: close']
+    if chunked:
+        lines.append('Transfer-Encoding: chunked')
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode())
+
+
+def _integer(text: str, name: str) -> int:
+    """Parse an integer parameter, rejecting the request if it is none."""
+    try:
+        return int(text)
+    except ValueError:
+        raise _BadRequest(HTTPStatus.BAD_REQUEST, f'{name} must be an integer')
+
+
+def _range(query: str) -> range:
+    """Parse the range of integers from the query of a request."""
+    parameters = parse_qs(query)
+    try:
+        start, stop = parameters['start'][-1], parameters['stop'][-1]
+    except KeyError:
+        raise _BadRequest(HTTPStatus.BAD_REQUEST,
+                          'start and stop are required')
+    step = _integer(parameters.get('step', ['1'])[-1], 'step')
+    if not step:
+        raise _BadRequest(HTTPStatus.BAD_REQUEST, 'step must not be zero')
+    return range(_integer(start, 'start'), _integer(stop, 'stop'), step)
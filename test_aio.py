@@ -0,0 +1,62 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+import asyncio
+from socket import socketpair
+from hypothesis import given, strategies as st
+from .aio import batches, write_range
+from .fizzbuzz import Rule, compile_rules, compile_table
+from .test_fizzbuzz import ranges, rulesets
+
+
+@given(rulesets(max_size=3, max_number=20), ranges(),
+       st.integers(min_value=1, max_value=50))
+def test_batches(rules: list[Rule], numbers: range, lines: int):
+    """The batches hold the results of the range in order."""
+    async def collect() -> list[list[str]]:
+        return [batch async for batch in batches(program, numbers, lines)]
+
+    program = compile_table(rules)
+    collected = asyncio.run(collect())
+    assert all(len(batch) == lines for batch in collected[:-1])
+    assert sum(collected, []) == list(map(compile_rules(rules), numbers))
+
+
+def test_write_range():
+    """The output arrives at the other end of a stream, even a slow one."""
+    program = compile_table([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    numbers = range(1, 200_001)
+
+    async def transfer() -> tuple[int, bytes]:
+        ours, theirs = socketpair()
+        _, writer = await asyncio.open_connection(sock=ours)
+        reader, _ = await asyncio.open_connection(sock=theirs)
+        sending = asyncio.create_task(write_range(program, numbers, writer))
+        received = b''
+        while not sending.done() or len(received) < sending.result():
+            received += await reader.read(1 << 12)
+        writer.close()
+        return await sending, received
+
+    written, received = asyncio.run(transfer())
+    assert written == len(received)
+    assert received.decode().splitlines() == list(program.evaluate(numbers))
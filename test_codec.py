@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+from hypothesis import assume, given, settings, strategies as st
+import pytest
+from .codec import decode, encode
+from .fizzbuzz import Rule, compile_rules, compile_table
+from .test_fizzbuzz import ranges, rules
+
+
+@settings(max_examples=50)
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5),
+       ranges(max_length=1000))
+def test_round_trip(rules: list[Rule], numbers: range):
+    """Decoding reproduces the output of the rules."""
+    assume(all(-2**63 <= i < 2**63 for i in (numbers.start, numbers.stop)))
+    expected = list(map(compile_rules(rules), numbers))
+    for program in (compile_rules(rules), compile_table(rules)):
+        encoded = decode(encode(program, numbers))
+        assert encoded.rules == tuple(rules)
+        assert encoded.numbers == numbers
+        assert list(encoded.lines()) == expected
+
+
+def test_compact():
+    """FizzBuzz takes a single byte per line and decodes with NumPy."""
+    numpy = pytest.importorskip('numpy')
+    rules = (Rule(3, 'Fizz'), Rule(5, 'Buzz'))
+    data = encode(compile_table(rules), range(1, 1001))
+    encoded = decode(data)
+    assert len(encoded.codes) == 1000
+    assert len(data) < 1200
+    codes = numpy.asarray(encoded.codes)
+    masks = numpy.array(encoded.masks, dtype=numpy.uint64)[codes]
+    assert (masks == 3).sum() == 66
+    assert numpy.flatnonzero(masks == 0)[:3].tolist() == [0, 1, 3]
+
+
+def test_invalid():
+    """Only encoded output can be decoded."""
+    data = encode(compile_table([Rule(3, 'Fizz')]), range(1, 100))
+    for invalid in (b'', b'xx', bytes(64), data[:-5], data[:40], data + b'x'):
+        with pytest.raises(ValueError):
+            decode(invalid)
+
+
+def test_out_of_bounds():
+    """Ranges and rule numbers beyond signed 64 bit integers are rejected."""
+    program = compile_rules([Rule(3, 'Fizz')])
+    with pytest.raises(ValueError):
+        encode(program, range(2**63, 2**63 + 10))
+    with pytest.raises(ValueError):
+        encode(compile_rules([Rule(2**63, 'Huge')]), range(10))
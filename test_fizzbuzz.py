@@ -20,10 +20,18 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 # For more information, please refer to <https://unlicense.org/>
-from itertools import pairwise
+import pytest
+from collections import Counter
+from io import SEEK_END, BufferedReader, BytesIO, UnsupportedOperation
+from itertools import islice, pairwise
 from string import ascii_letters
-from hypothesis import given, strategies as st
-from .fizzbuzz import Rule, compile_rules
+from typing import Callable
+from hypothesis import assume, given, strategies as st
+from .fizzbuzz import (ENGINES, OutputFile, Rule, compile_best,
+                       compile_cached, compile_factored, compile_interned,
+                       compile_lattice, compile_rules, compile_source,
+                       compile_table, main, match_masks, materialize, plan,
+                       sieve, simplify, stream, write_parallel, write_range)
 
 
 def unambiguous_rule_names(rules: list[Rule]):
@@ -36,19 +44,20 @@ def unambiguous_rule_names(rules: list[Rule]):
 
 
 @st.composite
-def rules(draw) -> Rule:
+def rules(draw, max_number=None) -> Rule:
     """
     Returns a strategy which randomly generates FizzBuzz rules.
 
+    :param max_number: Upper bound of the rule number, unbounded if `None`
     :return: Rule with random number and string value
     """
-    number = draw(st.integers(min_value=2))
+    number = draw(st.integers(min_value=2, max_value=max_number))
     value = draw(st.text(ascii_letters, min_size=1)).title()
     return Rule(number, value)
 
 
 @st.composite
-def rulesets(draw, max_size=5) -> Rule:
+def rulesets(draw, max_size=5, max_number=None) -> Rule:
     """
     Returns a strategy which generates a random FizzBuzz rule set.  All rules
     have unique number and value.  Additionally the value of one rule is
@@ -57,9 +66,10 @@ def rulesets(draw, max_size=5) -> Rule:
     which produced it.
 
     :param max_size: Maximum number of rules in the rule set
+    :param max_number: Upper bound of the rule numbers, unbounded if `None`
     :return: Unambiguous ruleset of random rules
     """
-    ruleset = draw(st.lists(rules(), min_size=1, max_size=max_size,
+    ruleset = draw(st.lists(rules(max_number), min_size=1, max_size=max_size,
                             unique_by=(lambda r: r.value, lambda r: r.number))
                    .filter(unambiguous_rule_names))
     return ruleset
@@ -159,3 +169,360 @@ def test_fizzbuzz_results_order(rules: list[Rule], data: st.DataObject):
     result = program(n)
     positions = (result.find(r.value) for r in positives)
     assert all(a < b for a, b in pairwise(positions))
+
+
+@given(rulesets(max_size=3, max_number=20), st.integers())
+def test_table_same_as_rules(rules: list[Rule], n: int):
+    """The tabulated program produces the same output as the plain one."""
+    program = compile_table(rules)
+    assert program.table is not None
+    assert program(n) == compile_rules(rules)(n)
+
+
+@given(rulesets(), st.integers())
+def test_table_fallback(rules: list[Rule], n: int):
+    """If the period is too large the rules are applied one by one."""
+    program = compile_table(rules, limit=1)
+    assert program.table is None
+    assert program(n) == compile_rules(rules)(n)
+
+
+@given(rulesets(max_size=3, max_number=20), st.integers(),
+       st.integers(min_value=0, max_value=200), st.integers().filter(bool))
+def test_evaluate_range(rules: list[Rule], start: int, length: int, step: int):
+    """Evaluating a range is the same as applying the program to each."""
+    numbers = range(start, start + length * step, step)
+    for program in (compile_rules(rules), compile_table(rules)):
+        assert list(program.evaluate(numbers)) == list(map(program, numbers))
+
+
+@given(rulesets(), st.lists(st.integers(-2**63, 2**63 - 1), max_size=50))
+def test_vectorized_backend(rules: list[Rule], values: list[int]):
+    """The vectorized backend agrees with the plain program."""
+    np = pytest.importorskip('numpy')
+    array = np.array(values, dtype=np.int64)
+    masks = match_masks(rules, array)
+    expected = [sum(rule.test(i) << k for k, rule in enumerate(rules))
+                for i in values]
+    assert masks.tolist() == expected
+    program = compile_rules(rules)
+    assert materialize(rules, array, masks) == list(map(program, values))
+
+
+@given(rulesets(max_size=3, max_number=20), st.integers(),
+       st.integers(min_value=0, max_value=200), st.integers().filter(bool),
+       st.integers(min_value=1, max_value=50))
+def test_write_range(rules: list[Rule], start: int, length: int, step: int,
+                     lines: int):
+    """Writing a range produces one line for each number."""
+    numbers = range(start, start + length * step, step)
+    for program in (compile_rules(rules), compile_table(rules)):
+        expected = ''.join(f'{program(i)}\n' for i in numbers).encode()
+        fp = BytesIO()
+        assert write_range(program, numbers, fp, lines) == len(expected)
+        assert fp.getvalue() == expected
+
+
+@given(rulesets(max_size=3, max_number=20))
+def test_compile_cached(rules: list[Rule]):
+    """Compiling the same rules again returns the cached program."""
+    compile_cached.cache_clear()
+    program = compile_cached(tuple(rules))
+    assert compile_cached(tuple(rules)) is program
+    assert compile_cached.cache_info()[:2] == (1, 1)
+    assert program == compile_table(rules)
+
+
+@pytest.mark.parametrize('table', [False, True])
+def test_write_parallel(table: bool):
+    """Rendering in worker processes produces the same output in order."""
+    rules = [Rule(3, 'Fizz'), Rule(5, 'Buzz'), Rule(7, 'Bazz')]
+    program = compile_table(rules) if table else compile_rules(rules)
+    numbers = range(-1000, 5000, 3)
+    expected, result = BytesIO(), BytesIO()
+    write_range(program, numbers, expected)
+    assert write_parallel(program, numbers, result, workers=2, lines=100) \
+        == len(expected.getvalue())
+    assert result.getvalue() == expected.getvalue()
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_main(engine: str, tmp_path):
+    """The command-line interface writes the output of the given rules."""
+    if engine == 'vectorized':
+        pytest.importorskip('numpy')
+    path = tmp_path / 'output.txt'
+    main(['--start', '-3', '--stop', '16', '--step', '2', '--rule', '3:Fizz',
+          '--rule', '5:Buzz', '--engine', engine, '--output', str(path)])
+    program = compile_rules([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    assert path.read_text() == ''.join(f'{program(i)}\n'
+                                       for i in range(-3, 16, 2))
+
+
+def test_main_default_lattice(tmp_path):
+    """The command-line interface runs the lattice engine when planned."""
+    rules = [Rule(1, 'a'), Rule(20000, 'b')] * 35
+    assert plan(rules, 'batch').engine == 'lattice'
+    path = tmp_path / 'output.txt'
+    main(['--stop', '5', '--output', str(path),
+          *(f'--rule={rule.number}:{rule.value}' for rule in rules)])
+    assert path.read_text() == ''.join(f'{compile_rules(rules)(i)}\n'
+                                       for i in range(1, 5))
+
+
+@pytest.mark.parametrize('arguments', [['--step', '0'],
+                                       ['--engine', 'parallel', '--workers',
+                                        '-1']])
+def test_main_invalid_keeps_output(arguments: list[str], tmp_path):
+    """Invalid arguments leave an existing output file untouched."""
+    path = tmp_path / 'output.txt'
+    path.write_text('previous\n')
+    with pytest.raises(SystemExit):
+        main([*arguments, '--output', str(path)])
+    assert path.read_text() == 'previous\n'
+
+
+@given(rulesets(max_size=3, max_number=20),
+       st.integers() | st.integers(min_value=10**18, max_value=10**30))
+def test_at(rules: list[Rule], n: int):
+    """Looking up a number in the table is the same as applying the rules."""
+    assert compile_table(rules).at(n) == compile_rules(rules)(n)
+    assert compile_table(rules).at(0) == ''.join(rule.value for rule in rules)
+
+
+@given(rulesets(), st.integers())
+def test_at_requires_table(rules: list[Rule], n: int):
+    """Programs without a table cannot look numbers up."""
+    with pytest.raises(ValueError):
+        compile_table(rules, limit=1).at(n)
+
+
+@st.composite
+def ranges(draw, max_length=200) -> range:
+    """
+    Returns a strategy which generates ranges of integers with any step.
+
+    :param max_length: Maximum number of integers in the range
+    :return: Range of integers
+    """
+    start = draw(st.integers())
+    length = draw(st.integers(min_value=0, max_value=max_length))
+    step = draw(st.integers(min_value=-20, max_value=20).filter(bool))
+    return range(start, start + length * step, step)
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5), ranges(),
+       st.data())
+def test_inverse_queries(rules: list[Rule], numbers: range,
+                         data: st.DataObject):
+    """Counting and finding outputs agrees with evaluating the range."""
+    program = compile_rules(rules)
+    outputs = list(program.evaluate(numbers))
+    text = data.draw(st.sampled_from([None, '', 'Fizz', *outputs]),
+                     label='text')
+    if text is None:
+        expected = [i for i, output in zip(numbers, outputs)
+                    if output == str(i)]
+    else:
+        expected = [i for i, output in zip(numbers, outputs) if output == text]
+    assert program.count(text, numbers) == len(expected)
+    assert list(program.find(text, numbers)) == expected
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5), ranges())
+def test_stats(rules: list[Rule], numbers: range):
+    """The statistics agree with evaluating the range."""
+    program = compile_rules(rules)
+    outputs = Counter(output for i, output in zip(numbers,
+                                                  program.evaluate(numbers))
+                      if output != str(i))
+    stats = program.stats(numbers)
+    assert stats.matches == tuple(sum(map(rule.test, numbers))
+                                  for rule in rules)
+    assert stats.numeric == len(numbers) - outputs.total()
+    assert stats.outputs == dict(outputs)
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5),
+       ranges() | st.builds(range, st.integers(-2000, 2000),
+                            st.integers(-2000, 2000),
+                            st.sampled_from([1, -1])),
+       st.data())
+def test_offsets(rules: list[Rule], numbers: range, data: st.DataObject):
+    """Sizes and offsets agree with the rendered output."""
+    program = compile_rules(rules)
+    lines = [f'{output}\n'.encode() for output in program.evaluate(numbers)]
+    output = b''.join(lines)
+    assert program.size(numbers) == len(output)
+    line = data.draw(st.integers(min_value=0, max_value=len(lines)),
+                     label='line')
+    offset = len(b''.join(lines[:line]))
+    assert program.offset(numbers, line) == offset
+    for byte in range(offset, offset + len(b''.join(lines[line:line + 1]))):
+        assert program.line(numbers, byte) == line
+    assert program.line(numbers, len(output)) == len(lines)
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5), ranges(),
+       st.lists(st.tuples(st.integers(min_value=0, max_value=2000),
+                          st.integers(min_value=0, max_value=100))))
+def test_output_file(rules: list[Rule], numbers: range,
+                     reads: list[tuple[int, int]]):
+    """Reading the virtual file at any position yields the rendered output."""
+    program = compile_table(rules)
+    expected = BytesIO()
+    write_range(program, numbers, expected)
+    output = expected.getvalue()
+    fp = OutputFile(program, numbers)
+    assert fp.read() == output
+    assert fp.seek(0, SEEK_END) == len(output)
+    for offset, size in reads:
+        fp.seek(offset)
+        assert fp.read(size) == output[offset:offset + size]
+        assert fp.tell() == min(offset + size, max(offset, len(output)))
+
+
+def test_output_file_unbounded():
+    """An unbounded virtual file can be read anywhere, but has no end."""
+    program = compile_table([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    with BufferedReader(OutputFile(program, 1)) as fp:
+        assert [fp.readline() for _ in range(5)] \
+            == [b'1\n', b'2\n', b'Fizz\n', b'4\n', b'Buzz\n']
+        fp.seek(program.offset(range(1, 10**20), 10**15))
+        assert fp.readline() == b'%d\n' % (10**15 + 1)
+        assert fp.readline() == b'Fizz\n'
+        with pytest.raises(UnsupportedOperation):
+            fp.seek(0, SEEK_END)
+
+
+def test_output_file_closed():
+    """A closed virtual file can neither be read nor seeked."""
+    output = OutputFile(compile_table([Rule(3, 'Fizz')]), range(1, 10))
+    assert output.read(5) == b'1\n2\nF'
+    output.close()
+    with pytest.raises(ValueError):
+        output.read(5)
+    with pytest.raises(ValueError):
+        output.seek(0)
+
+
+@given(st.lists(rules(), min_size=1, max_size=8), st.integers())
+def test_source_same_as_rules(rules: list[Rule], n: int):
+    """The generated function produces the same output as the plain one."""
+    assert compile_source(rules)(n) == compile_rules(rules)(n)
+
+
+@given(st.lists(rules(), min_size=1, max_size=8), ranges())
+def test_stream_same_as_rules(rules: list[Rule], numbers: range):
+    """Streaming a sequence produces the same output as the plain program."""
+    results = stream(rules, numbers.start, numbers.step)
+    assert list(islice(results, len(numbers))) \
+        == list(map(compile_rules(rules), numbers))
+
+
+def test_stream_huge_range():
+    """Ranges longer than `sys.maxsize` can be streamed."""
+    rules = [Rule(3, 'Fizz'), Rule(5, 'Buzz')]
+    evaluate: Callable = plan(rules, 'sequential')._replace(
+        engine='stream').build()
+    assert list(islice(evaluate(range(10**20, 10**21)), 3)) \
+        == ['Buzz', str(10**20 + 1), 'Fizz']
+
+
+@given(st.lists(rules(), min_size=1, max_size=8), ranges(),
+       st.integers(min_value=1, max_value=50))
+def test_sieve_same_as_rules(rules: list[Rule], numbers: range, block: int):
+    """Sieving a range produces the same output as the plain program."""
+    assert list(sieve(rules, numbers, block)) \
+        == list(map(compile_rules(rules), numbers))
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5), ranges(),
+       st.sampled_from(['random', 'sequential', 'batch']))
+def test_plan(rules: list[Rule], numbers: range, pattern):
+    """Every engine the planner considers produces the same output."""
+    assume(all(-2**63 <= i < 2**63 for i in (numbers.start, numbers.stop)))
+    chosen = plan(rules, pattern)
+    assert chosen.cost == min(chosen.estimates.values())
+    expected = list(map(compile_rules(rules), numbers))
+    for engine in chosen.estimates:
+        executable: Callable = chosen._replace(engine=engine).build()
+        if pattern == 'random':
+            assert list(map(executable, numbers)) == expected
+        else:
+            assert list(executable(numbers)) == expected
+
+
+def test_plan_factored():
+    """Thousands of prime rules are evaluated by factorizing."""
+    primes = [p for p in range(2, 5000) if all(p % q for q in range(2, p))]
+    rules = [Rule(p, f'{p},') for p in primes]
+    assert plan(rules).engine == 'factored'
+    assert compile_best(rules)(2 * 3 * 4999) == '2,3,4999,'
+
+
+@given(st.lists(st.builds(Rule, st.sampled_from([-3, -2, 1, 2, 3, 4, 6]),
+                          st.sampled_from(['', 'Fizz', 'Buzz']))),
+       st.integers())
+def test_simplify(rules: list[Rule], n: int):
+    """Simplified rules produce the same output with fewer rules."""
+    simplified = simplify(rules)
+    assert compile_rules(simplified.rules)(n) == compile_rules(rules)(n)
+    assert len(simplified.rules) + len(simplified.removed) \
+        + sum(len(group) - 1 for group in simplified.merged) == len(rules)
+    assert all(rule.value and rule.number > 0 for rule in simplified.rules)
+
+
+@given(st.lists(st.builds(Rule, st.sampled_from([2, 3, 4, 6, 8, 9, 12, 16, 18]),
+                          st.text(ascii_letters, max_size=3)), max_size=20)
+       | st.lists(rules(), min_size=1, max_size=5), st.integers())
+def test_lattice_same_as_rules(rules: list[Rule], n: int):
+    """Pruning by divisibility produces the same output as the plain program."""
+    assert compile_lattice(rules)(n) == compile_rules(rules)(n)
+
+
+@given(st.lists(st.builds(Rule, st.integers(min_value=1, max_value=60),
+                          st.text(ascii_letters, max_size=3)), max_size=30)
+       | st.lists(rules(), min_size=1, max_size=5),
+       st.integers(min_value=-1500, max_value=1500) | st.integers())
+def test_factored_same_as_rules(rules: list[Rule], n: int):
+    """Factorizing produces the same output as the plain program."""
+    assert compile_factored(rules, 1000)(n) == compile_rules(rules)(n)
+
+
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5), ranges())
+def test_masks(rules: list[Rule], numbers: range):
+    """Formatting the masks produces the same output as the plain program."""
+    expected = list(map(compile_rules(rules), numbers))
+    for program in (compile_rules(rules), compile_table(rules)):
+        masks = program.mask_range(numbers)
+        assert masks.typecode == 'B'
+        assert list(masks) == [program.mask(i) for i in numbers]
+        assert [program.format(mask, i)
+                for mask, i in zip(masks, numbers)] == expected
+
+
+def test_masks_typecode():
+    """Masks take the smallest type which fits all rules."""
+    program = compile_rules(Rule(k, 'x') for k in range(1, 17))
+    assert program.mask_range(range(3)).tolist() == [0xffff, 1, 3]
+    assert program.mask_range(range(3)).typecode == 'H'
+    with pytest.raises(ValueError):
+        compile_rules([Rule(1, 'x')] * 65).mask_range(range(3))
+
+
+@given(st.lists(rules(), min_size=1, max_size=5), st.integers())
+def test_interned_same_as_rules(rules: list[Rule], n: int):
+    """Interning produces the same output as the plain program."""
+    assert compile_interned(rules)(n) == compile_rules(rules)(n)
+    assert compile_interned(rules, limit=0)(n) == compile_rules(rules)(n)
+
+
+@pytest.mark.parametrize('numbers', [(3, 5), (1009, 1013, 1019)])
+def test_interned_shared(numbers: tuple[int, ...]):
+    """Non-numeric results are the same objects across calls and programs."""
+    rules = [Rule(n, f'x{n}') for n in numbers]
+    first, second = compile_interned(rules), compile_interned(rules)
+    product = numbers[0] * numbers[1]
+    assert first(product) is first(2 * product) is second(product)
+    assert first(product) is first.format(first.mask(product), product)
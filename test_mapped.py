@@ -0,0 +1,105 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+from hypothesis import assume, given, settings, strategies as st
+import pytest
+from .fizzbuzz import Rule, compile_table
+from .mapped import HEADER, MappedOutput, open_cached, save
+from .test_fizzbuzz import ranges, rules
+
+
+@settings(max_examples=25)
+@given(st.lists(rules(max_number=30), min_size=1, max_size=5),
+       ranges(max_length=1000))
+def test_save_and_map(tmp_path_factory, rules: list[Rule], numbers: range):
+    """Every line of a cache file is the output of its integer."""
+    assume(all(-2**63 <= i < 2**63 for i in (numbers.start, numbers.stop)))
+    path = tmp_path_factory.mktemp('cache') / 'output.fizzbuzz'
+    program = compile_table(rules)
+    save(program, numbers, path)
+    with MappedOutput(path) as output:
+        assert output.numbers == numbers
+        assert output.matches(program, numbers)
+        assert [bytes(output.line(k)) for k in range(len(output))] \
+            == [program(i).encode() for i in numbers]
+        assert [output.at(i) for i in numbers] == list(map(program, numbers))
+
+
+def test_open_cached_rebuilds(tmp_path):
+    """A cache file is only rebuilt if it does not match the request."""
+    path = tmp_path / 'output.fizzbuzz'
+    fizzbuzz = compile_table([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    fizzbazz = compile_table([Rule(3, 'Fizz'), Rule(7, 'Bazz')])
+    with open_cached(fizzbuzz, range(1, 101), path) as output:
+        assert output.at(15) == 'FizzBuzz'
+    mtime = path.stat().st_mtime_ns
+    with open_cached(fizzbuzz, range(1, 101), path) as output:
+        assert path.stat().st_mtime_ns == mtime
+    with open_cached(fizzbazz, range(1, 101), path) as output:
+        assert output.at(21) == 'FizzBazz'
+    with open_cached(fizzbazz, range(0, 50), path) as output:
+        assert len(output) == 50
+
+
+def test_save_newline_values(tmp_path):
+    """Values containing newlines do not shift the line offsets."""
+    path = tmp_path / 'output.fizzbuzz'
+    program = compile_table([Rule(3, 'Fi\nzz'), Rule(5, 'Bu\nzz')])
+    save(program, range(1, 100), path)
+    with MappedOutput(path) as output:
+        assert [output.at(i) for i in range(1, 100)] \
+            == list(map(program, range(1, 100)))
+
+
+def test_save_out_of_bounds(tmp_path):
+    """Ranges beyond signed 64 bit integers cannot be saved."""
+    program = compile_table([Rule(3, 'Fizz')])
+    with pytest.raises(ValueError):
+        save(program, range(2**63, 2**63 + 10), tmp_path / 'output.fizzbuzz')
+
+
+def test_save_while_mapped(tmp_path):
+    """Readers keep their version of a file while it is rebuilt."""
+    path = tmp_path / 'output.fizzbuzz'
+    program = compile_table([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    save(program, range(1, 100000), path)
+    with MappedOutput(path) as reader:
+        save(program, range(1, 10), path)
+        assert reader.at(99999) == 'Fizz'
+        with MappedOutput(path) as output:
+            assert len(output) == 9
+    assert [p.name for p in tmp_path.iterdir()] == ['output.fizzbuzz']
+
+
+def test_truncated(tmp_path):
+    """Truncated files are rejected and rebuilt."""
+    path = tmp_path / 'output.fizzbuzz'
+    program = compile_table([Rule(3, 'Fizz'), Rule(5, 'Buzz')])
+    save(program, range(1, 1000), path)
+    data = path.read_bytes()
+    for invalid in (data[:10], data[:HEADER.size + 100], data[:-1],
+                    data + b'x'):
+        path.write_bytes(invalid)
+        with pytest.raises(ValueError):
+            MappedOutput(path)
+        with open_cached(program, range(1, 1000), path) as output:
+            assert output.at(998) == '998'
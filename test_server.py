@@ -0,0 +1,95 @@
+# SPDX-License-Identifier: Unlicense
+# This is free and unencumbered software released into the public domain.
+#
+# Anyone is free to copy, modify, publish, use, compile, sell, or distribute
+# this software, either in source code form or as a compiled binary, for any
+# purpose, commercial or non-commercial, and by any means.
+#
+# In jurisdictions that recognize copyright laws, the author or authors of this
+# software dedicate any and all copyright interest in the software to the
+# public domain. We make this dedication for the benefit of the public at large
+# and to the detriment of our heirs and successors. We intend this dedication
+# to be an overt act of relinquishment in perpetuity of all present and future
+# rights to this software under copyright law.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN
+# ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# For more information, please refer to <https://unlicense.org/>
+import asyncio
+import json
+from .fizzbuzz import Rule, compile_rules
+from .server import start
+
+
+RULES = [Rule(3, 'Fizz'), Rule(5, 'Buzz')]
+
+
+def request(target: str, method: str = 'GET') -> tuple[int, bytes]:
+    """Serves the rules and returns the status and body of one request."""
+    async def exchange() -> bytes:
+        async with await start(RULES, port=0) as server:
+            host, port = server.sockets[0].getsockname()[:2]
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(f'{method} {target} HTTP/1.1\r\n'
+                         f'Host: {host}\r\n\r\n'.encode())
+            response = await reader.read()
+            writer.close()
+            return response
+
+    head, _, body = asyncio.run(exchange()).partition(b'\r\n\r\n')
+    status = int(head.split()[1])
+    if b'transfer-encoding: chunked' in head.lower():
+        body = dechunk(body)
+    return status, body
+
+
+def dechunk(body: bytes) -> bytes:
+    """Decodes a body with chunked transfer encoding."""
+    decoded = b''
+    while True:
+        size, _, body = body.partition(b'\r\n')
+        if not int(size, 16):
+            return decoded
+        decoded += body[:int(size, 16)]
+        body = body[int(size, 16) + 2:]
+
+
+def test_at():
+    """Single numbers can be looked up."""
+    assert request('/at/15') == (200, b'FizzBuzz\n')
+    assert request('/at/-7') == (200, b'-7\n')
+    assert request('/at/ten')[0] == 400
+
+
+def test_range():
+    """Ranges are streamed line by line."""
+    program = compile_rules(RULES)
+    status, body = request('/range?start=1&stop=100000&step=2')
+    assert status == 200
+    assert body.decode().splitlines() \
+        == list(map(program, range(1, 100000, 2)))
+    assert request('/range?start=1')[0] == 400
+    assert request('/range?start=1&stop=5&step=0')[0] == 400
+
+
+def test_stats():
+    """The statistics of a range are reported as JSON."""
+    status, body = request('/stats?start=1&stop=101')
+    assert status == 200
+    assert json.loads(body) == {
+        'rules': [{'number': 3, 'value': 'Fizz', 'matches': 33},
+                  {'number': 5, 'value': 'Buzz', 'matches': 20}],
+        'numeric': 53,
+        'outputs': {'Fizz': 27, 'Buzz': 14, 'FizzBuzz': 6},
+    }
+
+
+def test_errors():
+    """Unknown paths and methods are rejected."""
+    assert request('/nowhere')[0] == 404
+    assert request('/at/1', method='POST')[0] == 405